@@ -1,12 +1,17 @@
-from pdf_parser import extract_pdf_text, parse_transactions
+from pdf_parser import PARSER_VERSION, extract_pdf_text, parse_transactions
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import os
+import hashlib
+import json
+import tempfile
+import time
 from dotenv import load_dotenv
-from collections import defaultdict
-from datetime import datetime
+from collections import defaultdict, namedtuple
+from itertools import groupby
+from datetime import date, datetime, timedelta
 import logging
 import sys
 
@@ -30,46 +35,103 @@ BASE_DIR = Path(__file__).resolve().parent
 FRONTEND_DIR = BASE_DIR.parent / 'frontend'
 UPLOAD_DIR = BASE_DIR / 'uploads'
 UPLOAD_DIR.mkdir(exist_ok=True)
+CACHE_DIR = UPLOAD_DIR / 'cache'  # Parsed results keyed by parser version and PDF content hash
+CACHE_DIR.mkdir(exist_ok=True)
+CACHE_MAX_AGE = 24 * 60 * 60  # Seconds a cached result (full transaction data) is kept
+CACHE_MAX_ENTRIES = 32
 
 # Allowed file types
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 
+# Month abbreviations used in statement dates (e.g. "17 Sep 2024")
+_MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+def _parse_txn_date(value):
+    """Parse a 'DD Mon YYYY' transaction date, falling back to strptime."""
+    try:
+        day, month, year = value.split()
+        return date(int(year), _MONTHS[month], int(day))
+    except (KeyError, ValueError):
+        return datetime.strptime(value, '%d %b %Y').date()
+
+# Transactions as parallel per-field lists (struct of arrays)
+TxArrays = namedtuple('TxArrays', 'dates balances debits credits descriptions')
+
+def to_tx_arrays(transactions):
+    """
+    Convert parsed transaction dicts into TxArrays, parsing each date once.
+    Amounts are used as-is; parse_transactions already stores them as floats.
+    """
+    return TxArrays(
+        dates=[_parse_txn_date(t['date']) for t in transactions],
+        balances=[t['balance'] for t in transactions],
+        debits=[t['debit'] for t in transactions],
+        credits=[t['credit'] for t in transactions],
+        descriptions=[t['description'] for t in transactions]
+    )
+
 # Helper functions for balance analysis
-def calculate_daily_balances(transactions, start_date, end_date):
-    """Calculate daily balances for MAB calculation."""
-    from datetime import timedelta
-    
-    # Sort transactions by date
-    sorted_trans = sorted(transactions, key=lambda x: datetime.strptime(x['date'], '%d %b %Y'))
-    
-    # Initialize daily balances dictionary
-    daily_balances = {}
-    current_balance = float(sorted_trans[0]['balance'])  # Start with first transaction's balance
-    current_date = start_date
-    
-    # Initialize the first day's balance
-    daily_balances[start_date.strftime('%Y-%m-%d')] = current_balance
-    
-    # Calculate balance for each day in the period
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y-%m-%d')
-        
-        # Find all transactions for this date
-        days_transactions = [t for t in sorted_trans if 
-                           datetime.strptime(t['date'], '%d %b %Y').date() == current_date.date()]
-        
-        if days_transactions:
-            # Use the last transaction's balance for this day
-            current_balance = float(days_transactions[-1]['balance'])
+def _daily_balances_array(dated_balances, start_date, end_date):
+    """
+    Calculate daily balances from date-sorted (date, balance) pairs.
+    Returns (start_date, balances) where balances[i] is the closing balance
+    on start_date + i days.
+    """
+    balances = []
+    current_balance = dated_balances[0][1]  # Start with first transaction's balance
+    next_idx = 0
+
+    # Transactions before the period are not applied to it
+    while next_idx < len(dated_balances) and dated_balances[next_idx][0] < start_date:
+        next_idx += 1
+
+    # Calculate balance for each day in the period, walking the sorted
+    # transactions alongside the days (the last one of a day wins)
+    for i in range((end_date - start_date).days + 1):
+        current_date = start_date + timedelta(days=i)
+        while next_idx < len(dated_balances) and dated_balances[next_idx][0] <= current_date:
+            current_balance = dated_balances[next_idx][1]
+            next_idx += 1
         
-        daily_balances[date_str] = current_balance
-        current_date += timedelta(days=1)
+        balances.append(current_balance)
     
-    return daily_balances
+    return start_date, balances
+
+def daily_balances_to_dict(start_date, balances):
+    """Key daily balances by ISO date ('YYYY-MM-DD') for JSON output."""
+    return {(start_date + timedelta(days=i)).isoformat(): balance for i, balance in enumerate(balances)}
 
-def calculate_monthly_statistics(transactions):
-    """Calculate monthly balance statistics from transactions."""
-    if not transactions:
+def calculate_daily_balances(tx, start_date, end_date):
+    """
+    Calculate daily balances for MAB calculation from TxArrays as (start_date, balances).
+    The bounds may be dates or datetimes; datetimes are truncated to their date.
+    """
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    sorted_trans = sorted(zip(tx.dates, tx.balances), key=lambda x: x[0])
+    return _daily_balances_array(sorted_trans, start_date, end_date)
+
+def _add_daily_balance(stats, days, balance):
+    """Record a closing balance held for a number of days in month stats."""
+    stats['min_balance'] = min(stats['min_balance'], balance)
+    stats['max_balance'] = max(stats['max_balance'], balance)
+    for _ in range(days):
+        stats['total_balance'] += balance
+    stats['count'] += days  # Number of days
+    if stats['daily_balances'] is not None:
+        stats['daily_balances'][1].extend([balance] * days)
+
+def calculate_monthly_statistics(tx, include_daily_balances=False):
+    """
+    Calculate monthly balance statistics from TxArrays.
+    The per-day 'daily_balances' mapping is only built when requested.
+    """
+    if not tx.dates:
         return {}
         
     monthly_stats = defaultdict(lambda: {
@@ -79,42 +141,28 @@ def calculate_monthly_statistics(transactions):
         'days_maintained': 0,
         'total_balance': 0.0,
         'count': 0,
-        'daily_balances': {}
+        'daily_balances': None
     })
     
-    # Get date range for all transactions
-    dates = [datetime.strptime(t['date'], '%d %b %Y') for t in transactions]
-    overall_start = min(dates)
-    overall_end = max(dates)
-    
-    # Group transactions by month
-    monthly_transactions = defaultdict(list)
-    for trans in transactions:
-        date = datetime.strptime(trans['date'], '%d %b %Y')
-        month_key = f"{date.year}-{date.month:02d}"
-        monthly_transactions[month_key].append(trans)
+    # Sort once, then stream through each month's transactions in date order
+    sorted_trans = sorted(zip(tx.dates, tx.balances), key=lambda x: x[0])
     
-    # Calculate statistics for each month
-    for month_key, month_trans in monthly_transactions.items():
-        year = int(month_key.split('-')[0])
-        month = int(month_key.split('-')[1])
-        
-        # Find start and end dates for this month
-        month_dates = [datetime.strptime(t['date'], '%d %b %Y') for t in month_trans]
-        month_start = min(month_dates)
-        month_end = max(month_dates)
-        
-        # Calculate daily balances for this month
-        daily_balances = calculate_daily_balances(month_trans, month_start, month_end)
+    # Months are keyed by a single int (year * 12 + month - 1) while grouping
+    for month_idx, month_trans in groupby(sorted_trans, key=lambda x: x[0].year * 12 + x[0].month - 1):
+        year, month = divmod(month_idx, 12)
+        stats = monthly_stats[f"{year}-{month + 1:02d}"]
+        prev_date, prev_balance = None, None
+        for txn_date, balance in month_trans:
+            if prev_date is None:
+                if include_daily_balances:
+                    stats['daily_balances'] = (txn_date, [])
+            elif txn_date != prev_date:
+                # Carry the previous closing balance forward up to this transaction
+                _add_daily_balance(stats, (txn_date - prev_date).days, prev_balance)
+            prev_date, prev_balance = txn_date, balance  # The last transaction of a day wins
         
-        # Calculate statistics
-        balances = list(daily_balances.values())
-        stats = monthly_stats[month_key]
-        stats['min_balance'] = min(balances)
-        stats['max_balance'] = max(balances)
-        stats['total_balance'] = sum(balances)
-        stats['count'] = len(balances)  # Number of days
-        stats['daily_balances'] = daily_balances  # Store daily balances for reference
+        # The last transaction of a month covers only its own day
+        _add_daily_balance(stats, 1, prev_balance)
     
     # Calculate averages and format results
     results = {}
@@ -128,7 +176,6 @@ def calculate_monthly_statistics(transactions):
                 'max_balance': round(stats['max_balance'], 2),
                 'avg_balance': round(stats['avg_balance'], 2),
                 'days_maintained': stats['count'],
-                'daily_balances': stats['daily_balances'],
                 'mab_calculation': {
                     'sum_of_daily_balances': round(stats['total_balance'], 2),
                     'number_of_days': stats['count'],
@@ -136,12 +183,14 @@ def calculate_monthly_statistics(transactions):
                     'calculation': f"MAB = ₹{round(stats['total_balance'], 2)} / {stats['count']} days = ₹{round(stats['avg_balance'], 2)}"
                 }
             }
+            if include_daily_balances:
+                results[month]['daily_balances'] = daily_balances_to_dict(*stats['daily_balances'])
     
     return results
 
-def analyze_balance_maintenance(transactions, target_balance):
-    """Analyze balance maintenance against target amount."""
-    if not transactions:
+def analyze_balance_maintenance(tx, target_balance):
+    """Analyze balance maintenance of TxArrays against target amount."""
+    if not tx.dates:
         return {
             'average_balance': 0,
             'maintenance_status': 'No transactions found',
@@ -149,18 +198,16 @@ def analyze_balance_maintenance(transactions, target_balance):
         }
     
     # Calculate date range of statement
-    dates = [datetime.strptime(t['date'], '%d %b %Y') for t in transactions]
-    start_date = min(dates)
-    end_date = max(dates)
+    start_date = min(tx.dates)
+    end_date = max(tx.dates)
     statement_period = {
         'start': start_date.strftime('%B %Y'),
         'end': end_date.strftime('%B %Y')
     }
     
-    balances = [float(t['balance']) for t in transactions]
-    avg_balance = sum(balances) / len(balances)
-    min_balance = min(balances)
-    max_balance = max(balances)
+    avg_balance = sum(tx.balances) / len(tx.balances)
+    min_balance = min(tx.balances)
+    max_balance = max(tx.balances)
     
     # Calculate percentage of target maintained
     target_balance = float(target_balance) if target_balance else 0
@@ -229,6 +276,41 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50 MB
 # Enable debug mode
 app.debug = True
 
+# Result cache helpers
+def _prune_cache():
+    """Delete expired cache entries and the oldest ones beyond CACHE_MAX_ENTRIES."""
+    entries = sorted(CACHE_DIR.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+    now = time.time()
+    for i, path in enumerate(entries):
+        if i >= CACHE_MAX_ENTRIES or now - path.stat().st_mtime > CACHE_MAX_AGE:
+            path.unlink(missing_ok=True)
+
+def _read_cached_result(cache_path):
+    """Return the cached result at cache_path, or None if missing or expired."""
+    try:
+        if time.time() - cache_path.stat().st_mtime > CACHE_MAX_AGE:
+            cache_path.unlink(missing_ok=True)
+            return None
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cached_result(cache_path, result):
+    """Best-effort cache write; failures are logged and never fail the request."""
+    tmp_path = None
+    try:
+        # Write to a temporary file first so readers never see a partial result
+        with tempfile.NamedTemporaryFile('w', dir=CACHE_DIR, suffix='.tmp', delete=False, encoding='utf-8') as f:
+            tmp_path = f.name
+            json.dump(result, f)
+        os.replace(tmp_path, cache_path)
+        _prune_cache()
+    except Exception as e:
+        logging.warning(f"Could not write result cache {cache_path.name}: {str(e)}")
+        if tmp_path:
+            Path(tmp_path).unlink(missing_ok=True)
+
 # Check file type
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -242,28 +324,25 @@ def analyze_monthly_balance(transactions):
     """
     monthly_data = defaultdict(list)
 
-    # Group balances by month-year
+    # Group balances by (year, month) so months sort without re-parsing labels
     for txn in transactions:
         try:
             txn_date = datetime.strptime(txn['date'], "%Y-%m-%d")
-            month_key = txn_date.strftime("%b %Y")  # e.g., 'Jan 2025'
-            monthly_data[month_key].append(txn['balance'])
+            monthly_data[(txn_date.year, txn_date.month)].append(txn['balance'])
         except Exception:
             continue  # skip if date/balance format is wrong
 
-    # Prepare summary
+    # Prepare summary, sorted by month
     summary = []
-    for month, balances in monthly_data.items():
+    for (year, month), balances in sorted(monthly_data.items()):
         min_balance = min(balances)
         avg_balance = sum(balances) / len(balances)
         summary.append({
-            "month": month,
+            "month": date(year, month, 1).strftime("%b %Y"),  # e.g., 'Jan 2025'
             "min_balance": min_balance,
             "avg_balance": round(avg_balance, 2)
         })
 
-    # Sort by month
-    summary.sort(key=lambda x: datetime.strptime(x['month'], "%b %Y"))
     return summary
 
 # Upload endpoint
@@ -294,25 +373,30 @@ def upload():
         if not allowed_file(file.filename):
             return jsonify({'status': 'error', 'message': 'Invalid file type'}), 400
 
-        # Save file
+        # Read the upload into memory; nothing is written to disk but the cached result
         filename = secure_filename(file.filename)
-        save_path = UPLOAD_DIR / filename
-        file.save(save_path)
-        
-        logging.info(f"File saved successfully at {save_path}")
+        data = file.read()
+        logging.info(f"Read {len(data)} bytes from {filename}")
+
+        # Return the cached result if this exact PDF was processed before
+        cache_path = CACHE_DIR / f"{PARSER_VERSION}-{hashlib.sha256(data).hexdigest()}.json"
+        cached = _read_cached_result(cache_path)
+        if cached is not None:
+            logging.info(f"Returning cached result for {filename}")
+            return jsonify(cached)
 
         # Process PDF and extract transactions
         try:
             logging.info(f"Starting PDF processing for {filename}")
-            text = extract_pdf_text(str(save_path))
+            text = extract_pdf_text(data)
             logging.info(f"Extracted text length: {len(text)} characters")
             
             transactions = parse_transactions(text)
             logging.info(f"Parsed {len(transactions)} transactions")
             
             # Calculate summary statistics
-            total_debits = sum(float(t['debit']) for t in transactions)
-            total_credits = sum(float(t['credit']) for t in transactions)
+            total_debits = sum(t['debit'] for t in transactions)
+            total_credits = sum(t['credit'] for t in transactions)
             total_amount = total_credits - total_debits  # net change
             avg_transaction = total_amount / len(transactions) if transactions else 0
 
@@ -325,6 +409,7 @@ def upload():
                     'average_transaction': avg_transaction
                 }
             }
+            _write_cached_result(cache_path, response)
             return jsonify(response)
             
         except Exception as e:
@@ -340,7 +425,7 @@ def upload():
         try:
             if filename.lower().endswith('.pdf'):
                 logging.info(f"Starting PDF processing for {filename}")
-                text = extract_pdf_text(save_path)
+                text = extract_pdf_text(data)
                 logging.info(f"Extracted text length: {len(text)} characters")
                 transactions = parse_transactions(text)
                 logging.info(f"Parsed {len(transactions)} transactions")
@@ -1,104 +1,190 @@
-import pdfplumber
+import io
 import re
-import os
+import logging
 from datetime import datetime
 
-def extract_pdf_text(pdf_path):
-    """Extract all text from a PDF file."""
-    print(f"\n{'='*50}")
-    print(f"STARTING PDF EXTRACTION")
-    print(f"File path: {pdf_path}")
-    print(f"File exists: {os.path.exists(pdf_path)}")
-    file_size = os.path.getsize(pdf_path) if os.path.exists(pdf_path) else 'N/A'
-    print(f"File size: {file_size} bytes")
-    
-    # List all files in uploads directory
-    upload_dir = os.path.dirname(pdf_path)
-    print(f"\nContents of upload directory ({upload_dir}):")
-    for f in os.listdir(upload_dir):
-        f_path = os.path.join(upload_dir, f)
-        f_size = os.path.getsize(f_path)
-        print(f"- {f} (Size: {f_size} bytes)")
-    
-    print(f"{'='*50}\n")
+try:
+    import pymupdf
+except ImportError:  # Fall back to the slower pure-Python extractor
+    pymupdf = None
+    import pdfplumber
+
+# Bump whenever parse_transactions output changes so cached upload results are not reused
+PARSER_VERSION = 1
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)  # Per-line parsing diagnostics are opt-in
+
+# SBI specific date format (e.g., "17 Sep 2024")
+_DATE_RE = re.compile(r"(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{4})")
+# Amounts with commas and decimals, e.g. "1,234.56", with word boundaries.
+# Lookarounds keep the separating whitespace unconsumed so that adjacent
+# amounts ("21,000.00 32,335.05") both match.
+_AMOUNT_RE = re.compile(r"(?:^|(?<=\s))([\d,]+\.\d{2})(?=\s|$)")
+# Description keywords that mark a transaction as a debit
+_DEBIT_RE = re.compile(r"debit|transfer to|paid to", re.IGNORECASE)
+
+# Vertical distance (in points) within which words belong to the same line
+_LINE_Y_TOLERANCE = 3
+
+def _table_text(tables):
+    """Flatten extracted tables into tab-separated rows, one per line."""
+    rows = []
+    for table in tables:
+        for row in table:
+            # Convert all items to strings and join with tabs
+            rows.append("\t".join(str(item) if item is not None else "" for item in row) + "\n")
+    return "".join(rows)
+
+def _has_transaction_lines(text):
+    """Check whether page text already contains the transaction table."""
+    return bool(text) and ("Txn Date" in text or _DATE_RE.search(text) is not None)
+
+def _page_text(page):
+    """
+    Rebuild the text lines of a PyMuPDF page from its words.
+    Words whose tops are within _LINE_Y_TOLERANCE points are joined left to
+    right, which gives the same row-per-line layout as pdfplumber's
+    extract_text() that parse_transactions expects.
+    """
+    words = sorted(page.get_text("words"), key=lambda w: (w[1], w[0]))
+    lines = []
+    line_words = []
+    line_top = None
+    for word in words:
+        if line_words and word[1] - line_top > _LINE_Y_TOLERANCE:
+            lines.append(" ".join(w[4] for w in sorted(line_words, key=lambda w: w[0])))
+            line_words = []
+        if not line_words:
+            line_top = word[1]
+        line_words.append(word)
+    if line_words:
+        lines.append(" ".join(w[4] for w in sorted(line_words, key=lambda w: w[0])))
+    return "\n".join(lines)
+
+def _extract_with_pymupdf(source):
+    """Extract text, or table rows as a fallback, from every page using PyMuPDF."""
+    chunks = []
+    doc = pymupdf.open(stream=source, filetype="pdf") if isinstance(source, bytes) else pymupdf.open(source)
+    with doc:
+        logger.debug("Opened PDF with %d pages", doc.page_count)
+        for i, page in enumerate(doc):
+            text = _page_text(page)
+            if _has_transaction_lines(text):
+                logger.debug("Extracted %d characters of regular text from page %d", len(text), i + 1)
+                chunks.append(text + "\n")
+                continue
+            
+            # Tables repeat the text layer, so only extract them when it has no transactions
+            tables = [table.extract() for table in page.find_tables().tables]
+            if tables:
+                logger.debug("Found %d tables on page %d", len(tables), i + 1)
+                chunks.append(_table_text(tables))
+            elif text:
+                chunks.append(text + "\n")
+            else:
+                logger.debug("No regular text found on page %d", i + 1)
+    return "".join(chunks)
+
+def _extract_with_pdfplumber(source):
+    """Extract text, or table rows as a fallback, from every page using pdfplumber."""
+    chunks = []
+    with pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source) as pdf:
+        logger.debug("Opened PDF with %d pages", len(pdf.pages))
+        for i, page in enumerate(pdf.pages):
+            text = page.extract_text()
+            if _has_transaction_lines(text):
+                logger.debug("Extracted %d characters of regular text from page %d", len(text), i + 1)
+                chunks.append(text + "\n")
+                continue
+            
+            # Tables repeat the text layer, so only extract them when it has no transactions
+            tables = page.extract_tables()
+            if tables:
+                logger.debug("Found %d tables on page %d", len(tables), i + 1)
+                chunks.append(_table_text(tables))
+            elif text:
+                chunks.append(text + "\n")
+            else:
+                logger.debug("No regular text found on page %d", i + 1)
+    return "".join(chunks)
+
+def extract_pdf_text(pdf):
+    """Extract all text from a PDF given as bytes, a binary file object or a file path."""
+    if hasattr(pdf, 'read'):
+        pdf = pdf.read()
+    if isinstance(pdf, (bytes, bytearray)):
+        return _extract_pdf_text(bytes(pdf))
+    return _extract_pdf_text(str(pdf))
+
+def _extract_pdf_text(source):
+    """Extract all text from a PDF file path or in-memory PDF bytes."""
+    logger.debug("Starting PDF extraction (%s)", source if isinstance(source, str) else f"{len(source)} bytes")
     
-    full_text = ""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            print(f"Successfully opened PDF with {len(pdf.pages)} pages")
-            print("\nPDF Document Information:")
-            print(f"Number of pages: {len(pdf.pages)}")
-            if hasattr(pdf, 'metadata') and pdf.metadata:
-                print("Metadata:")
-                for key, value in pdf.metadata.items():
-                    print(f"  {key}: {value}")
-            else:
-                print("No metadata available")
-            for i, page in enumerate(pdf.pages):
-                print(f"Processing page {i+1}")
-                # Try to extract tables first
-                tables = page.extract_tables()
-                if tables:
-                    print(f"\nFound {len(tables)} tables on page {i+1}")
-                    for table_idx, table in enumerate(tables):
-                        print(f"\nTable {table_idx + 1} on page {i+1}:")
-                        print(f"Number of rows: {len(table)}")
-                        
-                        # Print table headers (first row) to help identify transaction tables
-                        if table and len(table) > 0:
-                            print("\nTable Headers:")
-                            headers = [str(h) if h is not None else "" for h in table[0]]
-                            print(" | ".join(headers))
-                            
-                        # Process each row
-                        for row_idx, row in enumerate(table):
-                            # Convert all items to strings and join with tabs
-                            row_text = "\t".join(str(item) if item is not None else "" for item in row)
-                            # Only print first 5 and last 5 rows to avoid flooding the logs
-                            if row_idx < 5 or row_idx >= len(table) - 5:
-                                print(f"Row {row_idx}: {row_text}")
-                            elif row_idx == 5:
-                                print("... [rows omitted for brevity] ...")
-                            full_text += row_text + "\n"
-                
-                # Also get regular text
-                text = page.extract_text()
-                if text:
-                    print(f"Extracted {len(text)} characters of regular text from page {i+1}")
-                    full_text += text + "\n"
-                else:
-                    print(f"No regular text found on page {i+1}")
-                
-                # Print a sample of what we found
-                print(f"Sample text from page {i+1}:")
-                print(full_text.split('\n')[-5:] if full_text else "No text found")
+        if pymupdf is not None:
+            full_text = _extract_with_pymupdf(source)
+        else:
+            full_text = _extract_with_pdfplumber(source)
     except Exception as e:
-        print(f"Error extracting PDF text: {str(e)}")
+        logger.error("Error extracting PDF text: %s", e)
         raise
     
-    print(f"Finished extracting text, total {len(full_text)} characters")
-    print("Sample of extracted text:")
-    print("\n".join(full_text.split('\n')[:10]))  # Print first 10 lines
+    logger.debug("Finished extracting text, total %d characters", len(full_text))
     return full_text
 
+def _flush(current_row, date_str):
+    """Build a transaction from the collected lines of one statement row."""
+    debit = 0.0
+    credit = 0.0
+    balance = 0.0
+    
+    # Join all lines of the transaction
+    full_text = " ".join(current_row)
+    logger.debug("Processing transaction text: %s", full_text)
+    
+    # Find all amounts; only the last two (amount, balance) are ever used,
+    # so skip converting the rest
+    matches = _AMOUNT_RE.findall(full_text)
+    logger.debug("Found %d amounts", len(matches))
+    amounts = [float(a.replace(",", "")) for a in matches[-2:]]
+    
+    if amounts:
+        # Last amount is always balance in SBI format
+        balance = amounts[-1]
+        
+        # Check the remaining amounts
+        if len(amounts) > 1:
+            # Look at transaction description to determine debit/credit
+            is_debit = _DEBIT_RE.search(full_text) is not None
+            transaction_amount = amounts[-2]  # Amount before balance
+            
+            if is_debit:
+                debit = transaction_amount
+            else:
+                credit = transaction_amount
+    
+    transaction = {
+        "date": date_str,
+        "debit": debit,
+        "credit": credit,
+        "balance": balance,
+        "amount": -debit if debit > 0 else credit,  # negative for debits, positive for credits
+        "description": full_text.split("\n")[0]  # Use first line as description
+    }
+    logger.debug("Parsed transaction: %s", transaction)
+    return transaction
+
 def parse_transactions(text):
     """Convert extracted PDF text into structured transaction rows."""
-    print("Starting transaction parsing")
-    print(f"Input text length: {len(text)}")
-    print("First few lines of text:")
-    for i, line in enumerate(text.split('\n')[:5]):
-        print(f"Line {i+1}: {line}")
+    logger.debug("Starting transaction parsing, input text length: %d", len(text))
     
     transactions = []
     lines = text.split("\n")
-    print(f"Found {len(lines)} lines to process")
-    
-    # SBI specific date format (e.g., "17 Sep 2024")
-    date_pattern = r"(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{4})"
-    # Amount patterns to match numbers with commas and decimals
-    amount_pattern = r"(?:^|\s)([\d,]+\.\d{2})(?:\s|$)"  # Matches amounts like "1,234.56" with word boundaries
+    logger.debug("Found %d lines to process", len(lines))
     
     current_row = []
+    current_date = None
     inside_table = False
     header_found = False
     
@@ -116,53 +202,15 @@ def parse_transactions(text):
             continue
         
         # Look for date in the line
-        date_match = re.search(date_pattern, line)
+        date_match = _DATE_RE.search(line)
         if date_match:
             # Process previous transaction if exists
             if current_row:
-                debit = 0
-                credit = 0
-                balance = 0
-                
-                # Join all lines of the transaction
-                full_text = " ".join(current_row)
-                print(f"Processing transaction text: {full_text}")
-                
-                # Find all amounts
-                amounts = re.findall(amount_pattern, full_text)
-                amounts = [float(a.replace(",", "")) for a in amounts if a]
-                print(f"Found amounts: {amounts}")
-                
-                if amounts:
-                    # Last amount is always balance in SBI format
-                    balance = amounts[-1]
-                    
-                    # Check the remaining amounts
-                    if len(amounts) > 1:
-                        # Look at transaction description to determine debit/credit
-                        is_debit = any(x in full_text.lower() for x in ["debit", "transfer to", "paid to"])
-                        transaction_amount = amounts[-2]  # Amount before balance
-                        
-                        if is_debit:
-                            debit = transaction_amount
-                        else:
-                            credit = transaction_amount
-                
-                # Get the full date from matched pattern
-                date_str = date_match.group(1)
-                
-                transaction = {
-                    "date": date_str,
-                    "debit": debit,
-                    "credit": credit,
-                    "balance": balance,
-                    "description": full_text.split("\n")[0]  # Use first line as description
-                }
-                print(f"Parsed transaction: {transaction}")
-                transactions.append(transaction)
+                transactions.append(_flush(current_row, current_date))
             
             # Start new transaction
             current_row = [line]
+            current_date = date_match.group(1)
             inside_table = True
         elif inside_table and line.strip():
             # Continue collecting lines for current transaction
@@ -170,48 +218,8 @@ def parse_transactions(text):
     
     # Process last transaction if any
     if current_row:
-        debit = 0
-        credit = 0
-        balance = 0
-        
-        full_text = " ".join(current_row)
-        amounts = re.findall(amount_pattern, full_text)
-        amounts = [float(a.replace(",", "")) for a in amounts if a]
-        
-        if amounts:
-            balance = amounts[-1]
-            if len(amounts) > 1:
-                is_debit = any(x in full_text.lower() for x in ["debit", "transfer to", "paid to"])
-                transaction_amount = amounts[-2]
-                
-                if is_debit:
-                    debit = transaction_amount
-                else:
-                    credit = transaction_amount
-        
-        # Get the date from the last transaction
-        date_match = re.search(date_pattern, full_text)
-        if date_match:
-            date_str = date_match.group(1)
-            
-            transaction = {
-                "date": date_str,
-                "debit": debit,
-                "credit": credit,
-                "balance": balance,
-                "amount": -debit if debit > 0 else credit,  # negative for debits, positive for credits
-                "balance": balance,
-                "amount": -debit if debit > 0 else credit,  # negative for debits, positive for credits
-                "description": full_text.split("\n")[0]  # Use first line as description
-            }
-            print(f"Parsed transaction: {transaction}")
-            transactions.append(transaction)
+        transactions.append(_flush(current_row, current_date))
     
-    print(f"Total transactions found: {len(transactions)}")
-    if transactions:
-        print("Sample transactions:")
-        print("First:", transactions[0])
-        print("Middle:", transactions[len(transactions)//2])
-        print("Last:", transactions[-1])
+    logger.debug("Total transactions found: %d", len(transactions))
     
     return transactions